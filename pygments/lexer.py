@@ -11,6 +11,12 @@
 import re
 import sys
 import time
+import weakref
+
+try:
+    from re import _parser as _sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse as _sre_parse
 
 from pygments.filter import apply_filters, Filter
 from pygments.filters import get_filter_by_name
@@ -438,14 +444,18 @@ def using(_other, **kwargs):
         else:
             gt_kwargs['stack'] = ('root', s)
 
+    # the lexer instances created for each lexer using the callback
+    lexers = weakref.WeakKeyDictionary()
+
     if _other is this:
         def callback(lexer, match, ctx=None):
             # if keyword arguments are given the callback
             # function has to create a new lexer instance
             if kwargs:
-                # XXX: cache that somehow
-                kwargs.update(lexer.options)
-                lx = lexer.__class__(**kwargs)
+                lx = lexers.get(lexer)
+                if lx is None:
+                    lx = lexers[lexer] = lexer.__class__(**{**kwargs,
+                                                            **lexer.options})
             else:
                 lx = lexer
             s = match.start()
@@ -455,9 +465,9 @@ def using(_other, **kwargs):
                 ctx.pos = match.end()
     else:
         def callback(lexer, match, ctx=None):
-            # XXX: cache that somehow
-            kwargs.update(lexer.options)
-            lx = _other(**kwargs)
+            lx = lexers.get(lexer)
+            if lx is None:
+                lx = lexers[lexer] = _other(**{**kwargs, **lexer.options})
 
             s = match.start()
             for i, t, v in lx.get_tokens_unprocessed(match.group(), **gt_kwargs):
@@ -490,22 +500,275 @@ class words(Future):
         self.words = words
         self.prefix = prefix
         self.suffix = suffix
+        self._regex = None
 
     def get(self):
-        return regex_opt(self.words, prefix=self.prefix, suffix=self.suffix)
+        # the same words are often used by several lexers, e.g. subclasses
+        if self._regex is None:
+            self._regex = regex_opt(self.words, prefix=self.prefix,
+                                    suffix=self.suffix)
+        return self._regex
+
+
+# Constructs that keep a rule's regex from being embedded in a larger one:
+# group references, which would refer to other groups once combined, and
+# global inline flags, which are only allowed at the start of a regex.
+_uncombinable_re = re.compile(r'\\[1-9]|\(\?P=|\(\?\(|\(\?[aiLmsux]+\)')
+
+# Characters beyond Latin-1, as in the big Unicode classes of identifiers:
+# compiling a class containing them is slow (the re module optimizes it
+# character by character), and would be paid again for each combined regex
+# the rule is part of.
+_wide_chars_re = re.compile(r'[^\x00-\xff]|\\[uU][0-9a-fA-F]|\\N\{')
+
+
+def _combinable_flags(rexmatch):
+    """
+    Return the flags of a rule's regex if it can be part of a combined
+    regex, else None.
+    """
+    rex = getattr(rexmatch, '__self__', None)
+    if isinstance(rex, re.Pattern) and rexmatch.__name__ == 'match' \
+            and isinstance(rex.pattern, str) \
+            and not _uncombinable_re.search(rex.pattern) \
+            and not _wide_chars_re.search(rex.pattern):
+        return rex.flags
+    return None
+
+
+def _combine_rules(rules):
+    """
+    Combine rules into a single regex ``(?:rule1)()|(?:rule2)()|...``.
+    The empty group that closes each alternative tells which rule
+    matched.  Return the match function of the combined regex and a dict
+    mapping the index of these groups to ``(rematch, action, new_state)``,
+    or None if the regexes cannot be combined.
+
+    ``rematch`` is the match function of the rule if its action is a
+    callback, which expects the groups of its own rule, and None otherwise.
+    """
+    parts = []
+    table = {}
+    ngroups = 0
+    for rexmatch, action, new_state in rules:
+        rex = rexmatch.__self__
+        parts.append(f'(?:{rex.pattern})()')
+        ngroups += rex.groups + 1
+        if action is None or type(action) is _TokenType:
+            rexmatch = None
+        table[ngroups] = (rexmatch, action, new_state)
+    try:
+        combined = re.compile('|'.join(parts), rules[0][0].__self__.flags)
+    except re.error:
+        return None
+    return combined.match, table
+
+
+def _generate_matcher(steps):
+    """
+    Generate a function that tries the steps of a state in turn, as
+    returned by `RegexLexerMeta._process_state_matcher`.  Each step is a
+    ``(match, rule)`` pair, where ``rule`` is either the ``(action,
+    new_state)`` of a single rule or the table of a combined regex (see
+    `_combine_rules`).  Generating the function saves the loop over the
+    steps and the unpacking of each of them.
+    """
+    params = []
+    code = []
+    for i, (match, rule) in enumerate(steps):
+        params.append(f'match{i}, rule{i}')
+        code += [f'        m = match{i}(text, pos)',
+                 '        if m:']
+        if isinstance(rule, dict):
+            code += [f'            rematch, action, new_state = rule{i}[m.lastindex]',
+                     '            if rematch is not None:',
+                     '                m = rematch(text, pos)',
+                     '            return m, action, new_state']
+        else:
+            code += [f'            return (m,) + rule{i}']
+    code = [f'def make_match({", ".join(params)}):',
+            '    def match(text, pos):',
+            *code,
+            '        return None',
+            '    return match']
+    namespace = {}
+    exec('\n'.join(code), namespace)
+    return namespace['make_match'](*[item for step in steps for item in step])
+
+
+def _rules_matcher(statetokens):
+    """
+    Return a function ``match(text, pos)`` trying the given rules in
+    order.
+
+    Consecutive rules are combined into a single regex where possible,
+    so that one call into the regex engine replaces trying each of
+    them in turn.  Rules whose regex cannot be embedded in a larger one
+    (see `_combinable_flags`) are tried on their own.
+    """
+    runs = []
+    last_flags = None
+    for rule in statetokens:
+        flags = _combinable_flags(rule[0])
+        if flags is None or flags != last_flags:
+            runs.append([])
+        runs[-1].append(rule)
+        last_flags = flags
+
+    steps = []
+    for run in runs:
+        combined = _combine_rules(run) if len(run) > 1 else None
+        if combined is None:
+            steps.extend((rexmatch, (action, new_state))
+                         for rexmatch, action, new_state in run)
+        else:
+            steps.append(combined)
+    return _generate_matcher(steps)
+
+
+_sre_categories = {
+    _sre_parse.CATEGORY_DIGIT: r'\d', _sre_parse.CATEGORY_NOT_DIGIT: r'\D',
+    _sre_parse.CATEGORY_SPACE: r'\s', _sre_parse.CATEGORY_NOT_SPACE: r'\S',
+    _sre_parse.CATEGORY_WORD: r'\w', _sre_parse.CATEGORY_NOT_WORD: r'\W',
+}
+
+
+def _first_char_classes(items):
+    """
+    Return the character classes (as regex strings) that a parsed regex
+    can start with and whether it can match the empty string, or None if
+    this is not known.
+    """
+    classes = []
+    for op, av in items:
+        if op is _sre_parse.LITERAL:
+            classes.append('[' + re.escape(chr(av)) + ']')
+            return classes, False
+        elif op is _sre_parse.NOT_LITERAL:
+            classes.append('[^' + re.escape(chr(av)) + ']')
+            return classes, False
+        elif op is _sre_parse.IN:
+            parts = []
+            for iop, iav in av:
+                if iop is _sre_parse.NEGATE and not parts:
+                    parts.append('^')
+                elif iop is _sre_parse.LITERAL:
+                    parts.append(re.escape(chr(iav)))
+                elif iop is _sre_parse.RANGE:
+                    parts.append(re.escape(chr(iav[0])) + '-' +
+                                 re.escape(chr(iav[1])))
+                elif iop is _sre_parse.CATEGORY and iav in _sre_categories:
+                    parts.append(_sre_categories[iav])
+                else:
+                    return None
+            classes.append('[' + ''.join(parts) + ']')
+            return classes, False
+        elif op in (_sre_parse.AT, _sre_parse.ASSERT, _sre_parse.ASSERT_NOT):
+            # zero-width: the next item gives the first character
+            continue
+        elif op is _sre_parse.SUBPATTERN:
+            if av[1] or av[2]:
+                return None  # local flags
+            sub = [av[3]]
+            min_count = 1
+        elif op is _sre_parse.BRANCH:
+            sub = av[1]
+            min_count = 1
+        elif op in (_sre_parse.MAX_REPEAT, _sre_parse.MIN_REPEAT):
+            sub = [av[2]]
+            min_count = av[0]
+        else:
+            return None
+        nullable = False
+        for alternative in sub:
+            first = _first_char_classes(alternative)
+            if first is None:
+                return None
+            classes += first[0]
+            nullable = nullable or first[1]
+        if not nullable and min_count:
+            return classes, False
+    return classes, True
+
+
+# First character matchers by regex, shared since states include the same
+# rules and parsing a regex is slow.  Held weakly, like the compiled regexes
+# below.
+_first_char_matchers = weakref.WeakKeyDictionary()
+
+
+def _first_char_matcher(rexmatch):
+    """
+    Return a function telling whether a character can start a match of a
+    rule's regex, or None if any character (or none) might.
+    """
+    rex = getattr(rexmatch, '__self__', None)
+    if not isinstance(rex, re.Pattern) or rexmatch.__name__ != 'match' \
+            or not isinstance(rex.pattern, str):
+        return None
+    if rex not in _first_char_matchers:
+        try:
+            first = _first_char_classes(_sre_parse.parse(rex.pattern,
+                                                         rex.flags))
+        except Exception:
+            first = None
+        if first is None or first[1]:
+            _first_char_matchers[rex] = None
+        else:
+            _first_char_matchers[rex] = re.compile(
+                '|'.join(first[0]), rex.flags & (re.IGNORECASE | re.ASCII)).match
+    return _first_char_matchers[rex]
+
+
+# Compiled rule regexes and matchers by rules of a state, see
+# `RegexLexerMeta._process_regex` and `RegexLexerMeta._get_state_matcher`.
+# Both only hold their values weakly: an entry lives as long as the
+# processed token definitions of some lexer class use it, so that lexer
+# classes created at runtime (e.g. by `load_lexer_from_file`) do not make
+# them grow forever.
+_compiled_regexes = weakref.WeakValueDictionary()
+_state_matchers = weakref.WeakValueDictionary()
+
+
+class _StateMatchers(dict):
+    """
+    The matchers of the states of processed token definitions, built on
+    first use, as most inputs only enter some of the states.
+    """
+
+    def __init__(self, lexercls, tokendefs):
+        self.lexercls = lexercls
+        self.tokendefs = tokendefs
+
+    def __missing__(self, state):
+        matcher = self[state] = \
+            self.lexercls._get_state_matcher(self.tokendefs[state])
+        return matcher
 
 
 class RegexLexerMeta(LexerMeta):
     """
     Metaclass for RegexLexer, creates the self._tokens attribute from
-    self.tokens on the first instantiation.
+    self.tokens on the first instantiation, and the self._matchers
+    attribute used to find the first matching rule of each state (whose
+    entries are only built when a state is first entered).
     """
 
     def _process_regex(cls, regex, rflags, state):
         """Preprocess the regular expression component of a token definition."""
         if isinstance(regex, Future):
             regex = regex.get()
-        return re.compile(regex, rflags).match
+        elif isinstance(regex, re.Pattern):
+            # compiled by the lexer, with its own flags
+            return regex.match
+        # unlike the cache of the re module, this one is not purged while
+        # the regex is in use, so that lexers sharing rules share their
+        # compiled regexes
+        try:
+            return _compiled_regexes[regex, rflags].match
+        except KeyError:
+            rex = _compiled_regexes[regex, rflags] = re.compile(regex, rflags)
+            return rex.match
 
     def _process_token(cls, token):
         """Preprocess the token component of a token definition."""
@@ -591,14 +854,107 @@ class RegexLexerMeta(LexerMeta):
             tokens.append((rex, token, new_state))
         return tokens
 
+    def _get_state_matcher(cls, statetokens):
+        """
+        Return the matcher for a state (see `_process_state_matcher`),
+        shared by all lexers with the same rules in a state, such as the
+        states subclasses inherit unchanged.
+        """
+        key = tuple(statetokens)
+        try:
+            return _state_matchers[key]
+        except KeyError:
+            matcher = _state_matchers[key] = \
+                cls._process_state_matcher(statetokens)
+            return matcher
+        except TypeError:  # unhashable callback
+            return cls._process_state_matcher(statetokens)
+
+    def _process_state_matcher(cls, statetokens):
+        """
+        Return a function ``match(text, pos)`` that finds the first rule of
+        a state matching at ``pos`` and returns ``(match, action,
+        new_state)``, or None if no rule matches.
+
+        The rules are first tried in turn.  Once a character has been
+        seen often enough at ``pos`` in the state, the rules are combined
+        (see `_rules_matcher`), and only the rules that can start with the
+        character are tried there (see `_first_char_matcher`), through a
+        matcher built for each such set of rules (at most 16 per state, and
+        only for sets of at most half the rules).  Compiling the combined
+        regexes costs more than compiling the rules themselves, so states
+        that are rarely entered, as in short inputs, do not pay for it.
+        """
+        if not statetokens:
+            return _rules_matcher(statetokens)
+        # building a matcher costs about as much as trying all rules a few
+        # hundred times more than needed, and more for long regexes, which
+        # take longer to parse
+        size = sum(len(rule[0].__self__.pattern) for rule in statetokens
+                   if isinstance(getattr(rule[0], '__self__', None),
+                                 re.Pattern))
+        threshold = max(300, size // 128)
+        by_char = {}
+        by_rules = {}
+        misses = {}
+        firsts = None
+        combined = None
+
+        def plain(text, pos):
+            for rexmatch, action, new_state in statetokens:
+                m = rexmatch(text, pos)
+                if m:
+                    return m, action, new_state
+            return None
+
+        def dispatch(char):
+            nonlocal firsts, combined
+            misses[char] = count = misses.get(char, 0) + 1
+            if count < threshold:
+                return plain
+            if firsts is None:
+                # published once complete, as other threads may use it
+                firsts = [_first_char_matcher(rule[0])
+                          for rule in statetokens]
+            indices = tuple(i for i, first in enumerate(firsts)
+                            if first is None or first(char))
+            matcher = by_rules.get(indices)
+            if matcher is None:
+                if 2 * len(indices) > len(statetokens) or len(by_rules) >= 16:
+                    # not worth a matcher of its own: use all rules
+                    if combined is None:
+                        combined = _rules_matcher(statetokens)
+                    matcher = combined
+                else:
+                    matcher = by_rules[indices] = _rules_matcher(
+                        [statetokens[i] for i in indices])
+            by_char[char] = matcher
+            return matcher
+
+        def match(text, pos):
+            char = text[pos:pos + 1]
+            return (by_char.get(char) or dispatch(char))(text, pos)
+        return match
+
     def process_tokendef(cls, name, tokendefs=None):
         """Preprocess a dictionary of token definitions."""
         processed = cls._all_tokens[name] = {}
+        cls._all_matchers[name] = _StateMatchers(cls, processed)
         tokendefs = tokendefs or cls.tokens[name]
         for state in list(tokendefs):
             cls._process_state(tokendefs, processed, state)
         return processed
 
+    def _get_matchers(cls, tokendefs):
+        """
+        Return the state matchers of processed token definitions, such as
+        the ones lexers with ``token_variants`` choose per instance.
+        """
+        for name, processed in cls._all_tokens.items():
+            if processed is tokendefs:
+                return cls._all_matchers[name]
+        return _StateMatchers(cls, tokendefs)
+
     def get_tokendefs(cls):
         """
         Merge tokens from superclasses in MRO order, returning a single tokendef
@@ -650,14 +1006,16 @@ class RegexLexerMeta(LexerMeta):
 
     def __call__(cls, *args, **kwds):
         """Instantiate cls after preprocessing its token definitions."""
-        if '_tokens' not in cls.__dict__:
+        if '_all_tokens' not in cls.__dict__:
             cls._all_tokens = {}
+            cls._all_matchers = {}
             cls._tmpname = 0
             if hasattr(cls, 'token_variants') and cls.token_variants:
                 # don't process yet
                 pass
             else:
                 cls._tokens = cls.process_tokendef('', cls.get_tokendefs())
+                cls._matchers = cls._all_matchers['']
 
         return type.__call__(cls, *args, **kwds)
 
@@ -705,43 +1063,47 @@ class RegexLexer(Lexer, metaclass=RegexLexerMeta):
         """
         pos = 0
         tokendefs = self._tokens
+        if tokendefs is getattr(type(self), '_tokens', None):
+            matchers = self._matchers
+        else:
+            # token definitions chosen per instance (see token_variants)
+            matchers = type(self)._get_matchers(tokendefs)
         statestack = list(stack)
-        statetokens = tokendefs[statestack[-1]]
+        statematch = matchers[statestack[-1]]
         while 1:
-            for rexmatch, action, new_state in statetokens:
-                m = rexmatch(text, pos)
-                if m:
-                    if action is not None:
-                        if type(action) is _TokenType:
-                            yield pos, action, m.group()
-                        else:
-                            yield from action(self, m)
-                    pos = m.end()
-                    if new_state is not None:
-                        # state transition
-                        if isinstance(new_state, tuple):
-                            for state in new_state:
-                                if state == '#pop':
-                                    if len(statestack) > 1:
-                                        statestack.pop()
-                                elif state == '#push':
-                                    statestack.append(statestack[-1])
-                                else:
-                                    statestack.append(state)
-                        elif isinstance(new_state, int):
-                            # pop, but keep at least one state on the stack
-                            # (random code leading to unexpected pops should
-                            # not allow exceptions)
-                            if abs(new_state) >= len(statestack):
-                                del statestack[1:]
+            found = statematch(text, pos)
+            if found:
+                m, action, new_state = found
+                if action is not None:
+                    if type(action) is _TokenType:
+                        yield pos, action, m.group()
+                    else:
+                        yield from action(self, m)
+                pos = m.end()
+                if new_state is not None:
+                    # state transition
+                    if isinstance(new_state, tuple):
+                        for state in new_state:
+                            if state == '#pop':
+                                if len(statestack) > 1:
+                                    statestack.pop()
+                            elif state == '#push':
+                                statestack.append(statestack[-1])
                             else:
-                                del statestack[new_state:]
-                        elif new_state == '#push':
-                            statestack.append(statestack[-1])
+                                statestack.append(state)
+                    elif isinstance(new_state, int):
+                        # pop, but keep at least one state on the stack
+                        # (random code leading to unexpected pops should
+                        # not allow exceptions)
+                        if abs(new_state) >= len(statestack):
+                            del statestack[1:]
                         else:
-                            assert False, f"wrong state def: {new_state!r}"
-                        statetokens = tokendefs[statestack[-1]]
-                    break
+                            del statestack[new_state:]
+                    elif new_state == '#push':
+                        statestack.append(statestack[-1])
+                    else:
+                        assert False, f"wrong state def: {new_state!r}"
+                    statematch = matchers[statestack[-1]]
             else:
                 # We are here only if all state tokens have been considered
                 # and there was not a match on any of them.
@@ -749,7 +1111,7 @@ class RegexLexer(Lexer, metaclass=RegexLexerMeta):
                     if text[pos] == '\n':
                         # at EOL, reset state to "root"
                         statestack = ['root']
-                        statetokens = tokendefs['root']
+                        statematch = matchers['root']
                         yield pos, Whitespace, '\n'
                         pos += 1
                         continue
@@ -919,7 +1281,11 @@ class ProfilingRegexLexerMeta(RegexLexerMeta):
                             suffix=regex.suffix)
         else:
             rex = regex
-        compiled = re.compile(rex, rflags)
+        if isinstance(rex, re.Pattern):
+            compiled = rex
+            rex = rex.pattern
+        else:
+            compiled = re.compile(rex, rflags)
 
         def match_func(text, pos, endpos=sys.maxsize):
             info = cls._prof_data[-1].setdefault((state, rex), [0, 0.0])
@@ -29,6 +29,7 @@ __all__ = ['get_lexer_by_name', 'get_lexer_for_filename', 'find_lexer_class',
            'guess_lexer', 'load_lexer_from_file'] + list(LEXERS) + list(COMPAT)
 
 _lexer_cache = {}
+_alias_cache = {}
 _pattern_cache = {}
 
 
@@ -48,6 +49,25 @@ def _load_lexers(module_name):
         _lexer_cache[cls.name] = cls
 
 
+def _find_builtin_lexer_class_by_alias(alias):
+    """Return the builtin `Lexer` subclass with the given alias, or None."""
+    if not _alias_cache:
+        # index the aliases; the first lexer listed wins, as in a search.
+        # Build the index before publishing it, so that other threads never
+        # see a partial one.
+        index = {}
+        for module_name, name, aliases, _, _ in LEXERS.values():
+            for lexer_alias in aliases:
+                index.setdefault(lexer_alias, (module_name, name))
+        _alias_cache.update(index)
+    if alias not in _alias_cache:
+        return None
+    module_name, name = _alias_cache[alias]
+    if name not in _lexer_cache:
+        _load_lexers(module_name)
+    return _lexer_cache[name]
+
+
 def get_all_lexers(plugins=True):
     """Return a generator of tuples in the form ``(name, aliases,
     filenames, mimetypes)`` of all know lexers.
@@ -95,11 +115,9 @@ def find_lexer_class_by_name(_alias):
     if not _alias:
         raise ClassNotFound(f'no lexer for alias {_alias!r} found')
     # lookup builtin lexers
-    for module_name, name, aliases, _, _ in LEXERS.values():
-        if _alias.lower() in aliases:
-            if name not in _lexer_cache:
-                _load_lexers(module_name)
-            return _lexer_cache[name]
+    cls = _find_builtin_lexer_class_by_alias(_alias.lower())
+    if cls is not None:
+        return cls
     # continue with lexers from setuptools entrypoints
     for cls in find_plugin_lexers():
         if _alias.lower() in cls.aliases:
@@ -120,11 +138,9 @@ def get_lexer_by_name(_alias, **options):
         raise ClassNotFound(f'no lexer for alias {_alias!r} found')
 
     # lookup builtin lexers
-    for module_name, name, aliases, _, _ in LEXERS.values():
-        if _alias.lower() in aliases:
-            if name not in _lexer_cache:
-                _load_lexers(module_name)
-            return _lexer_cache[name](**options)
+    cls = _find_builtin_lexer_class_by_alias(_alias.lower())
+    if cls is not None:
+        return cls(**options)
     # continue with lexers from setuptools entrypoints
     for cls in find_plugin_lexers():
         if _alias.lower() in cls.aliases:
@@ -28,6 +28,9 @@ class CFamilyLexer(RegexLexer):
     # The trailing ?, rather than *, avoids a geometric performance drop here.
     #: only one /* */ style comment
     _ws1 = r'\s*(?:/[*].*?[*]/\s*)?'
+    #: the same, without crossing line ends (used after ``^``, where
+    #: a run of blank lines would be rescanned at the start of each line)
+    _ws1_line = r'[^\S\n]*(?:/[*].*?[*]/[^\S\n]*)?'
 
     # Hexadecimal part in an hexadecimal integer/floating-point literal.
     # This includes decimal separators matching.
@@ -46,12 +49,27 @@ class CFamilyLexer(RegexLexer):
     # Beware not to use *? for the inner content! When these regexes
     # are embedded in larger regexes, that can cause the stuff*? to
     # match more than it would have if the regex had been used in
-    # a standalone way ...
-    _comment_single = r'//(?:.|(?<=\\)\n)*\n'
-    _comment_multiline = r'/(?:\\\n)?[*](?:[^*]|[*](?!(?:\\\n)?/))*[*](?:\\\n)?/'
+    # a standalone way ...  They are written as "unrolled" loops, which
+    # scan runs of ordinary characters in one step: a newline only
+    # continues a single line comment after a backslash, and a "*" in a
+    # multiline comment is only special before a "/".
+    _comment_single = \
+        r'//[^\n\\]*(?:\\+(?:\n|[^\n\\])[^\n\\]*)*(?:\n|(?<=\\\n))'
+    _comment_multiline = \
+        r'/(?:\\\n)?[*][^*]*(?:[*](?!(?:\\\n)?/)[^*]*)*[*](?:\\\n)?/'
 
     # Regex to match optional comments
-    _possible_comments = rf'\s*(?:(?:(?:{_comment_single})|(?:{_comment_multiline}))\s*)*'
+    _comments = rf'(?:(?:(?:{_comment_single})|(?:{_comment_multiline}))\s*)*'
+    _possible_comments = r'\s*' + _comments
+
+    # Beware of letting two adjacent parts of a regex match the same
+    # whitespace: when the regex fails, the engine retries every way of
+    # splitting the whitespace between them, which is quadratic in its
+    # length (and worse if it happens twice in the same regex).  So only
+    # comments may follow the whitespace after a return type, and the
+    # part between a signature and the brace may not start with whitespace.
+    _function_tail = r'(?:[^\s;{/"\'][^;{/"\']*)?'
+    _declaration_tail = r'(?:[^\s;/"\'][^;/"\']*)?'
 
     tokens = {
         'whitespace': [
@@ -59,9 +77,9 @@ class CFamilyLexer(RegexLexer):
             (r'^#if\s+0', Comment.Preproc, 'if0'),
             ('^#', Comment.Preproc, 'macro'),
             # or with whitespace
-            ('^(' + _ws1 + r')(#if\s+0)',
+            ('^(' + _ws1_line + r')(#if\s+0)',
              bygroups(using(this), Comment.Preproc), 'if0'),
-            ('^(' + _ws1 + ')(#)',
+            ('^(' + _ws1_line + ')(#)',
              bygroups(using(this), Comment.Preproc), 'macro'),
             # Labels:
             # Line start and possible indentation.
@@ -134,31 +152,19 @@ class CFamilyLexer(RegexLexer):
         'root': [
             include('whitespace'),
             include('keywords'),
-            # functions
+            # function definitions and declarations: the header they share
+            # is matched once, and the 'function_tail' state tells them apart
             (r'(' + _namespaced_ident + r'(?:[&*\s])+)'  # return arguments
-             r'(' + _possible_comments + r')'
-             r'(' + _namespaced_ident + r')'             # method name
-             r'(' + _possible_comments + r')'
-             r'(\([^;"\')]*?\))'                         # signature
-             r'(' + _possible_comments + r')'
-             r'([^;{/"\']*)(\{)',
-             bygroups(using(this), using(this, state='whitespace'),
-                      Name.Function, using(this, state='whitespace'),
-                      using(this), using(this, state='whitespace'),
-                      using(this), Punctuation),
-             'function'),
-            # function declarations
-            (r'(' + _namespaced_ident + r'(?:[&*\s])+)'  # return arguments
-             r'(' + _possible_comments + r')'
+             r'(' + _comments + r')'
              r'(' + _namespaced_ident + r')'             # method name
              r'(' + _possible_comments + r')'
              r'(\([^;"\')]*?\))'                         # signature
              r'(' + _possible_comments + r')'
-             r'([^;/"\']*)(;)',
+             r'(?=' + _function_tail + r'\{|' + _declaration_tail + r';)',
              bygroups(using(this), using(this, state='whitespace'),
                       Name.Function, using(this, state='whitespace'),
-                      using(this), using(this, state='whitespace'),
-                      using(this), Punctuation)),
+                      using(this), using(this, state='whitespace')),
+             'function_tail'),
             include('types'),
             default('statement'),
         ],
@@ -168,6 +174,12 @@ class CFamilyLexer(RegexLexer):
             (r'\}', Punctuation),
             (r'[{;]', Punctuation, '#pop'),
         ],
+        'function_tail': [
+            (r'(' + _function_tail + r')(\{)',
+             bygroups(using(this), Punctuation), ('#pop', 'function')),
+            (r'(' + _declaration_tail + r')(;)',
+             bygroups(using(this), Punctuation), '#pop'),
+        ],
         'function': [
             include('whitespace'),
             include('statements'),
@@ -191,17 +203,17 @@ class CFamilyLexer(RegexLexer):
                 bygroups(using(this), Comment.Preproc, using(this),
                          Comment.PreprocFile, Comment.Single)),
             (r'[^/\n]+', Comment.Preproc),
-            (r'/[*](.|\n)*?[*]/', Comment.Multiline),
-            (r'//.*?\n', Comment.Single, '#pop'),
+            (r'/[*][^*]*[*]+(?:[^*/][^*]*[*]+)*/', Comment.Multiline),
+            (r'//[^\n]*\n', Comment.Single, '#pop'),
             (r'/', Comment.Preproc),
             (r'(?<=\\)\n', Comment.Preproc),
             (r'\n', Comment.Preproc, '#pop'),
         ],
         'if0': [
-            (r'^\s*#if.*?(?<!\\)\n', Comment.Preproc, '#push'),
+            (r'^\s*#if[^\n]*(?<!\\)\n', Comment.Preproc, '#push'),
             (r'^\s*#el(?:se|if).*\n', Comment.Preproc, '#pop'),
-            (r'^\s*#endif.*?(?<!\\)\n', Comment.Preproc, '#pop'),
-            (r'.*?\n', Comment),
+            (r'^\s*#endif[^\n]*(?<!\\)\n', Comment.Preproc, '#pop'),
+            (r'[^\n]*\n', Comment),
         ],
         'classname': [
             (_ident, Name.Class, '#pop'),
@@ -253,8 +265,14 @@ class CFamilyLexer(RegexLexer):
         RegexLexer.__init__(self, **options)
 
     def get_tokens_unprocessed(self, text, stack=('root',)):
+        # Short token values such as keywords, operators and indentation
+        # repeat all over a source file: yield one string object for each of
+        # them rather than a new copy per occurrence.
+        strings = {}
         for index, token, value in \
                 RegexLexer.get_tokens_unprocessed(self, text, stack):
+            if len(value) <= 8:
+                value = strings.setdefault(value, value)
             if token is Name:
                 if self.stdlibhighlighting and value in self.stdlib_types:
                     token = Keyword.Type
@@ -37,10 +37,34 @@ class JavaLexer(RegexLexer):
 
     flags = re.MULTILINE | re.DOTALL
 
+    declaration_keywords = {
+        'abstract', 'const', 'enum', 'extends', 'final', 'implements', 'native',
+        'private', 'protected', 'public', 'sealed', 'static', 'strictfp',
+        'super', 'synchronized', 'throws', 'transient', 'volatile', 'yield'}
+    type_keywords = {
+        'boolean', 'byte', 'char', 'double', 'float', 'int', 'long', 'short',
+        'void'}
+    constant_keywords = {'true', 'false', 'null'}
+
+    def name_callback(lexer, match):
+        name = match.group()
+        if name in lexer.declaration_keywords:
+            yield match.start(), Keyword.Declaration, name
+        elif name in lexer.type_keywords:
+            yield match.start(), Keyword.Type, name
+        elif name in lexer.constant_keywords:
+            yield match.start(), Keyword.Constant, name
+        else:
+            yield match.start(), Name, name
+
     tokens = {
         'root': [
-            (r'(^\s*)((?:(?:public|private|protected|static|strictfp)(?:\s+))*)(record)\b',
+            (r'(^[^\S\n]*)((?:(?:public|private|protected|static|strictfp)(?:\s+))*)(record)\b',
              bygroups(Whitespace, using(this), Keyword.Declaration), 'class'),
+            # labels: before whitespace, so that ^ sees the indentation
+            (r'^([^\S\n]*)(default)(:)', bygroups(Whitespace, Keyword, Punctuation)),
+            (r'^([^\S\n]*)((?:[^\W\d]|\$)[\w$]*)(:)(?!:)',
+             bygroups(Whitespace, Name.Label, Punctuation)),
             (r'[^\S\n]+', Whitespace),
             (r'(//.*?)(\n)', bygroups(Comment.Single, Whitespace)),
             (r'/\*.*?\*/', Comment.Multiline),
@@ -49,19 +73,14 @@ class JavaLexer(RegexLexer):
             (r'(assert|break|case|catch|continue|default|do|else|finally|for|'
              r'if|goto|instanceof|new|return|switch|this|throw|try|while)\b',
              Keyword),
-            # method names
-            (r'((?:(?:[^\W\d]|\$)[\w.\[\]$<>]*\s+)+?)'  # return arguments
-             r'((?:[^\W\d]|\$)[\w$]*)'                  # method name
-             r'(\s*)(\()',                              # signature start
+            # method names; the words before the name are bounded so that a
+            # long run of words without a "(" is not rescanned from each word
+            (r'((?:(?:[^\W\d]|\$)[\w.\[\]$<>]*\s+){1,16}?)'  # return arguments
+             r'((?:[^\W\d]|\$)[\w$]*)'                       # method name
+             r'(\s*)(\()',                                   # signature start
              bygroups(using(this), Name.Function, Whitespace, Punctuation)),
             (r'@[^\W\d][\w.]*', Name.Decorator),
-            (r'(abstract|const|enum|extends|final|implements|native|private|'
-             r'protected|public|sealed|static|strictfp|super|synchronized|throws|'
-             r'transient|volatile|yield)\b', Keyword.Declaration),
-            (r'(boolean|byte|char|double|float|int|long|short|void)\b',
-             Keyword.Type),
             (r'(package)(\s+)', bygroups(Keyword.Namespace, Whitespace), 'import'),
-            (r'(true|false|null)\b', Keyword.Constant),
             (r'(class|interface)\b', Keyword.Declaration, 'class'),
             (r'(var)(\s+)', bygroups(Keyword.Declaration, Whitespace), 'var'),
             (r'(import(?:\s+static)?)(\s+)', bygroups(Keyword.Namespace, Whitespace),
@@ -71,10 +90,9 @@ class JavaLexer(RegexLexer):
             (r"'\\.'|'[^\\]'|'\\u[0-9a-fA-F]{4}'", String.Char),
             (r'(\.)((?:[^\W\d]|\$)[\w$]*)', bygroups(Punctuation,
                                                      Name.Attribute)),
-            (r'^(\s*)(default)(:)', bygroups(Whitespace, Keyword, Punctuation)),
-            (r'^(\s*)((?:[^\W\d]|\$)[\w$]*)(:)', bygroups(Whitespace, Name.Label,
-                                                          Punctuation)),
-            (r'([^\W\d]|\$)[\w$]*', Name),
+            # declaration keywords, types and constants are looked up in
+            # the sets above instead of being tried as separate rules
+            (r'(?:[^\W\d]|\$)[\w$]*', name_callback),
             (r'([0-9][0-9_]*\.([0-9][0-9_]*)?|'
              r'\.[0-9][0-9_]*)'
              r'([eE][+\-]?[0-9][0-9_]*)?[fFdD]?|'
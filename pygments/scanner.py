@@ -14,9 +14,21 @@
     :copyright: Copyright 2006-2024 by the Pygments team, see AUTHORS.
     :license: BSD, see LICENSE for details.
 """
+import functools
 import re
 
 
+@functools.lru_cache(maxsize=256)
+def _compile(pattern, flags):
+    """
+    Compile a pattern for all scanners.  Lexers create a new `Scanner` for
+    every input, so keeping the compiled patterns on the instance would
+    recompile every pattern on each call; the cache is bounded since any
+    pattern string can be passed to a scanner.
+    """
+    return re.compile(pattern, flags)
+
+
 class EndOfText(RuntimeError):
     """
     Raise if end of text is reached and the user
@@ -44,7 +56,6 @@ class Scanner:
         self.flags = flags
         self.last = None
         self.match = None
-        self._re_cache = {}
 
     def eos(self):
         """`True` if the scanner reached the end of text."""
@@ -59,9 +70,7 @@ class Scanner:
         """
         if self.eos:
             raise EndOfText()
-        if pattern not in self._re_cache:
-            self._re_cache[pattern] = re.compile(pattern, self.flags)
-        return self._re_cache[pattern].match(self.data, self.pos)
+        return _compile(pattern, self.flags).match(self.data, self.pos)
 
     def test(self, pattern):
         """Apply a pattern on the current position and check
@@ -81,10 +90,8 @@ class Scanner:
         """
         if self.eos:
             raise EndOfText()
-        if pattern not in self._re_cache:
-            self._re_cache[pattern] = re.compile(pattern, self.flags)
         self.last = self.match
-        m = self._re_cache[pattern].match(self.data, self.pos)
+        m = _compile(pattern, self.flags).match(self.data, self.pos)
         if m is None:
             return False
         self.start_pos = m.start()
@@ -192,6 +192,29 @@ def test_get_lexers():
         raise Exception
 
 
+def test_get_lexer_by_alias_index(monkeypatch):
+    # aliases are looked up through an index built from LEXERS; when two
+    # lexers share an alias, the first one listed wins
+    mapping = {}
+    for cls in ('PythonLexer', 'Python2Lexer', 'RubyLexer'):
+        module_name, lname, aliases, filenames, mimetypes = LEXERS[cls]
+        mapping[cls] = (module_name, lname, aliases + ('shared',),
+                        filenames, mimetypes)
+    # pygments.lexers is replaced by an _automodule copy, so patch the
+    # globals the lookup functions actually use
+    namespace = lexers.get_lexer_by_name.__globals__
+    monkeypatch.setitem(namespace, 'LEXERS', mapping)
+    monkeypatch.setitem(namespace, '_alias_cache', {})
+
+    assert isinstance(lexers.get_lexer_by_name('shared'), lexers.PythonLexer)
+    assert lexers.find_lexer_class_by_name('SHARED') is lexers.PythonLexer
+    assert lexers.find_lexer_class_by_name('python2') is lexers.Python2Lexer
+    assert lexers.get_lexer_by_name('rb').__class__ is lexers.RubyLexer
+    assert namespace['_alias_cache']['shared'] == mapping['PythonLexer'][:2]
+    with pytest.raises(ClassNotFound):
+        lexers.find_lexer_class_by_name('java')
+
+
 @pytest.mark.parametrize('cls', [getattr(formatters, name)
                                  for name in formatters.FORMATTERS])
 def test_formatter_public_api(cls):
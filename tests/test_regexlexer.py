@@ -6,10 +6,18 @@
     :license: BSD, see LICENSE for details.
 """
 
+import gc
+import re
+import threading
+import time
+import weakref
+
 import pytest
 
-from pygments.token import Text, Whitespace
-from pygments.lexer import RegexLexer, default
+import pygments.lexer
+from pygments.token import Text, Whitespace, Keyword, Name, Punctuation, \
+    String
+from pygments.lexer import RegexLexer, bygroups, default, _combinable_flags
 
 
 @pytest.fixture(scope='module')
@@ -63,3 +71,191 @@ def test_pop_empty_regular(lexer):
 def test_pop_empty_tuple(lexer):
     toks = list(lexer.get_tokens_unprocessed('@e'))
     assert toks == [(0, Text.Root, '@'), (1, Text.Root, 'e')]
+
+
+class CombinedLexer(RegexLexer):
+    """Test rules matched through a combined regex."""
+    tokens = {
+        'root': [
+            (r'(\w+)(=)(\w+)', bygroups(Name.Attribute, Punctuation, Name)),
+            (r'(["\'])(.*?)(\1)', bygroups(String, String, String)),
+            (r'(\w+)(:)', bygroups(Name.Label, Punctuation)),
+            (r'\w+', Name),
+            (r'\s+', Whitespace),
+        ],
+        'simple': [
+            (r'\s+', Whitespace),
+            (r'(\w+)(=)', bygroups(Name.Attribute, Punctuation)),
+            (r'\w+', Name),
+        ],
+    }
+
+
+def test_combined_callback_groups():
+    toks = list(CombinedLexer().get_tokens_unprocessed('a=b c', ('simple',)))
+    assert toks == [
+        (0, Name.Attribute, 'a'), (1, Punctuation, '='), (2, Name, 'b'),
+        (3, Whitespace, ' '), (4, Name, 'c')]
+
+
+def test_uncombinable_backreference():
+    toks = list(CombinedLexer().get_tokens_unprocessed('x=y "a\'" z'))
+    assert toks == [
+        (0, Name.Attribute, 'x'), (1, Punctuation, '='), (2, Name, 'y'),
+        (3, Whitespace, ' '), (4, String, '"'), (5, String, "a'"),
+        (7, String, '"'), (8, Whitespace, ' '), (9, Name, 'z')]
+
+
+def test_combined_after_uncombinable():
+    toks = list(CombinedLexer().get_tokens_unprocessed("'b' k: v"))
+    assert toks == [
+        (0, String, "'"), (1, String, 'b'), (2, String, "'"),
+        (3, Whitespace, ' '), (4, Name.Label, 'k'), (5, Punctuation, ':'),
+        (6, Whitespace, ' '), (7, Name, 'v')]
+
+
+def test_wide_rules_not_combined():
+    # big Unicode classes are slow to compile again as part of a larger regex
+    assert _combinable_flags(re.compile(r'[a-z]+').match) == re.UNICODE
+    assert _combinable_flags(re.compile('[a-z\u0370-\u03ff]+').match) is None
+    assert _combinable_flags(re.compile(r'[a-z\u0370-\u03ff]+').match) is None
+
+def test_first_char_dispatch():
+    # enough tokens for each character to use only the rules it can start
+    toks = list(CombinedLexer().get_tokens_unprocessed("x=y 'b' k: v " * 400))
+    assert toks[-13:] == [
+        (5187, Name.Attribute, 'x'), (5188, Punctuation, '='),
+        (5189, Name, 'y'), (5190, Whitespace, ' '), (5191, String, "'"),
+        (5192, String, 'b'), (5193, String, "'"), (5194, Whitespace, ' '),
+        (5195, Name.Label, 'k'), (5196, Punctuation, ':'),
+        (5197, Whitespace, ' '), (5198, Name, 'v'), (5199, Whitespace, ' ')]
+
+
+def test_first_char_dispatch_threads(monkeypatch):
+    # threads entering a state together must all see every rule
+    first_char_matcher = pygments.lexer._first_char_matcher
+
+    def slow_first_char_matcher(rexmatch):
+        time.sleep(0.001)
+        return first_char_matcher(rexmatch)
+
+    class ThreadLexer(RegexLexer):
+        tokens = {'root': CombinedLexer.tokens['root'] + [(r'thread', Text)]}
+
+    monkeypatch.setattr(pygments.lexer, '_first_char_matcher',
+                        slow_first_char_matcher)
+    text = "x=y 'b' k: v " * 400
+    expected = list(CombinedLexer().get_tokens_unprocessed(text))
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(
+        list(ThreadLexer().get_tokens_unprocessed(text)))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [expected] * 8
+
+
+def test_first_char_dispatch_bounded(monkeypatch):
+    # a matcher for the rules of each character would be too many to build,
+    # as big Unicode classes are slow to compile
+    punctuation = '!#$%&()*+,-./:;<=>?@[]^{|}~'
+
+    class WideLexer(RegexLexer):
+        tokens = {
+            'root': [
+                (r'\s+', Whitespace),
+                ('[a-z\u00c0-\U0010ffff][a-z0-9\u00c0-\U0010ffff]*', Name),
+            ] + [(re.escape(char), Punctuation) for char in punctuation],
+        }
+
+    built = []
+    rules_matcher = pygments.lexer._rules_matcher
+
+    def counting_rules_matcher(statetokens):
+        built.append(len(statetokens))
+        return rules_matcher(statetokens)
+
+    monkeypatch.setattr(pygments.lexer, '_rules_matcher',
+                        counting_rules_matcher)
+    text = (' '.join([*punctuation, 'wörd']) + ' ') * 400
+    toks = list(WideLexer().get_tokens_unprocessed(text))
+    assert toks[-4:] == [(len(text) - 7, Punctuation, '~'),
+                         (len(text) - 6, Whitespace, ' '),
+                         (len(text) - 5, Name, 'wörd'),
+                         (len(text) - 1, Whitespace, ' ')]
+    assert len(toks) == 400 * (2 * len(punctuation) + 2)
+    # at most 16 matchers for sets of rules, and one for all of them
+    assert len(built) <= 17
+
+def test_shared_states():
+    from pygments.lexers import CLexer, CppLexer
+    CLexer()
+    CppLexer()
+    assert CLexer._matchers['string'] is CppLexer._matchers['string']
+    assert CLexer._matchers['root'] is not CppLexer._matchers['root']
+
+
+def test_state_matchers_built_on_use():
+    class LazyLexer(RegexLexer):
+        tokens = {
+            'root': [(r'a', Text.Root, 'other')],
+            'other': [(r'b', Text.Other, '#pop')],
+            'unused': [(r'c', Text)],
+        }
+
+    assert list(LazyLexer().get_tokens_unprocessed('ab')) == [
+        (0, Text.Root, 'a'), (1, Text.Other, 'b')]
+    assert set(LazyLexer._matchers) == {'root', 'other'}
+
+
+def test_token_variants_matchers_kept():
+    # token definitions chosen per instance keep their matchers on the class
+    from pygments.lexers import CSharpLexer
+    assert list(CSharpLexer().get_tokens('x')) == [(Name, 'x'), (Whitespace, '\n')]
+    matcher = CSharpLexer._all_matchers['basic']['root']
+    list(CSharpLexer().get_tokens('y'))
+    assert CSharpLexer._all_matchers['basic']['root'] is matcher
+    assert CSharpLexer(unicodelevel='full')._tokens is not CSharpLexer()._tokens
+
+def test_compiled_regex():
+    class CompiledLexer(RegexLexer):
+        tokens = {
+            'root': [
+                (re.compile(r'end', re.IGNORECASE), Keyword),
+                (r'[a-z]+', Name),
+                (r'\s+', Whitespace),
+            ],
+        }
+
+    toks = list(CompiledLexer().get_tokens_unprocessed('END end x'))
+    assert toks == [
+        (0, Keyword, 'END'), (3, Whitespace, ' '), (4, Keyword, 'end'),
+        (7, Whitespace, ' '), (8, Name, 'x')]
+
+
+def test_lexer_class_collected():
+    # the shared regexes and state matchers must not keep lexer classes
+    # (e.g. loaded from files) alive, even when another lexer uses them
+    def make_lexer():
+        class TemporaryLexer(CombinedLexer):
+            def callback(lexer, match):
+                yield match.start(), Name, match.group()
+
+            tokens = {
+                'root': [
+                    (r'[a-z]+', callback),
+                    (r'temporary-\d+', Keyword),
+                    (r'\s+', Whitespace),
+                ],
+            }
+
+        list(TemporaryLexer().get_tokens_unprocessed('a ' * 400))
+        list(TemporaryLexer().get_tokens_unprocessed('a=b ' * 400,
+                                                     ('simple',)))
+        return weakref.ref(TemporaryLexer)
+
+    ref = make_lexer()
+    assert CombinedLexer()._matchers['simple']
+    gc.collect()
+    assert ref() is None
@@ -0,0 +1,40 @@
+"""
+    Tests for pygments.scanner
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    :copyright: Copyright 2006-2024 by the Pygments team, see AUTHORS.
+    :license: BSD, see LICENSE for details.
+"""
+
+import re
+
+from pygments.scanner import Scanner, _compile
+
+
+def test_scan():
+    scanner = Scanner('foo bar')
+    assert scanner.scan(r'\w+')
+    assert scanner.match == 'foo'
+    assert not scanner.scan(r'\w+')
+    assert scanner.scan(r'\s+')
+    assert scanner.test(r'bar')
+    assert scanner.scan(r'\w+')
+    assert scanner.last == ' '
+    assert scanner.eos
+
+
+def test_pattern_cache_shared_per_flags():
+    first = Scanner('abc', re.IGNORECASE)
+    second = Scanner('ABC', re.IGNORECASE)
+    hits = _compile.cache_info().hits
+    assert first.scan('abc')
+    assert second.scan('abc')
+    assert _compile.cache_info().hits > hits
+
+    # patterns compiled with other flags must not be reused
+    plain = Scanner('ABC')
+    assert not plain.scan('abc')
+
+
+def test_pattern_cache_bounded():
+    assert _compile.cache_info().maxsize is not None
@@ -37,3 +37,25 @@ def test_error():
     def gen():
         return list(MyLexer().get_tokens('#a'))
     assert raises(KeyError, gen)
+
+
+def test_sublexer_reused():
+    created = []
+
+    class CountingLexer(MyLexer):
+        def __init__(self, **options):
+            created.append(options)
+            MyLexer.__init__(self, **options)
+
+    class OuterLexer(RegexLexer):
+        tokens = {
+            'root': [
+                (r'\((.*?)\)', using(CountingLexer, stripnl=False)),
+                (r'[^(]+', Text),
+            ],
+        }
+
+    lexer = OuterLexer(tabsize=4)
+    list(lexer.get_tokens('(a) (b) (c)'))
+    list(OuterLexer().get_tokens('(d)'))
+    assert created == [{'stripnl': False, 'tabsize': 4}, {'stripnl': False}]